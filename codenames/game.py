@@ -2,11 +2,41 @@ import random
 import time
 import json
 import enum
+import atexit
+import functools
 import os
 import shutil
 import sys
 import colorama
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+colorama.init()
+
+# Board markers for words that have already been guessed
+RED_REVEALED = "*Red*"
+BLUE_REVEALED = "*Blue*"
+CIVILIAN_REVEALED = "*Civilian*"
+ASSASSIN_REVEALED = "*Assassin*"
+
+# Integer ids for key grid cells, HIDDEN marks a word that has not been guessed yet
+HIDDEN, RED, BLUE, CIVILIAN, ASSASSIN = range(5)
+KEY_IDS = {"Red": RED, "Blue": BLUE, "Civilian": CIVILIAN, "Assassin": ASSASSIN}
+REVEALED_MARKERS = (None, RED_REVEALED, BLUE_REVEALED, CIVILIAN_REVEALED, ASSASSIN_REVEALED)
+KEY_COLORS = (None, colorama.Fore.RED, colorama.Fore.BLUE, colorama.Fore.RESET, colorama.Fore.MAGENTA)
+
+
+@functools.lru_cache(maxsize=1)
+def _load_wordlist():
+    """Read the game wordpool once per process"""
+    with open("codenames/players/cm_wordlist.txt", "r") as f:
+        words = f.read().splitlines()
+    assert len(words) == len(set(words)), "game wordpool should not have duplicates"
+    return tuple(words)
+
 
 class GameCondition(enum.Enum):
     """Enumeration that represents the different states of the game"""
@@ -20,6 +50,10 @@ class Game:
     """Class that setups up game details and calls Codemaster/Guesser pairs to play the game
     """
 
+    # results files are opened once per process and shared by every Game
+    _results_fh = None
+    _results_json_fh = None
+
     def __init__(self, codemaster_red, guesser_red, codemaster_blue, guesser_blue,
                  seed="time", do_print=True, do_log=True, game_name="default",
                  cmr_kwargs={}, gr_kwargs={}, cmb_kwargs={}, gb_kwargs={},
@@ -39,7 +73,7 @@ class Game:
                 Value used to init random, "time" for time.time(). 
                 Defaults to "time".
             do_print (bool, optional): 
-                Whether to keep on sys.stdout or turn off. 
+                Whether to print the game to sys.stdout. 
                 Defaults to True.
             do_log (bool, optional): 
                 Whether to append to log file or not. 
@@ -62,12 +96,9 @@ class Game:
         self.game_winner = None
         self.game_start_time = time.time()
         self.game_end_time = None
-        colorama.init()
 
         self.do_print = do_print
-        if not self.do_print:
-            self._save_stdout = sys.stdout
-            sys.stdout = open(os.devnull, 'w')
+        self._print = print if do_print else (lambda *args, **kwargs: None)
 
         self.codemaster_red = codemaster_red("Red", **cmr_kwargs)
         self.guesser_red = guesser_red("Red", **gr_kwargs)
@@ -90,7 +121,9 @@ class Game:
         # Record of all moves previously made
         self.move_history = []
 
-        # set seed so that board/keygrid can be reloaded later
+        # set seed so that board/keygrid can be reloaded later.
+        # The board and key grid must keep being drawn with random.shuffle in this order,
+        # otherwise the seeds recorded in the results files no longer reproduce their games.
         if seed == 'time':
             self.seed = time.time()
             random.seed(self.seed)
@@ -98,85 +131,103 @@ class Game:
             self.seed = seed
             random.seed(int(seed))
 
-        print("seed:", self.seed)
+        self._print("seed:", self.seed)
 
         # load board words
-        with open("codenames/players/cm_wordlist.txt", "r") as f:
-            temp = f.read().splitlines()
-            assert len(temp) == len(set(temp)), "game wordpool should not have duplicates"
-            random.shuffle(temp)
-            self.words_on_board = temp[:25]
+        temp = list(_load_wordlist())
+        random.shuffle(temp)
+        self.words_on_board = temp[:25]
+
+        # map each board word to its position so guesses don't scan the board,
+        # keyed by the normalized form that guesses are matched against
+        self._word_to_index = {w.upper().strip(): i for i, w in enumerate(self.words_on_board)}
 
         # set grid key for codemaster (spymaster)
         self.key_grid = ["Red"] * self.num_red_words + ["Blue"] * self.num_blue_words + \
                         ["Civilian"] * self.num_civilian_words + ["Assassin"] * self.num_assassin_words
         random.shuffle(self.key_grid)
 
-    def __del__(self):
-        """reset stdout if using the do_print==False option"""
-        if not self.do_print:
-            sys.stdout.close()
-            sys.stdout = self._save_stdout
+        # board state as key ids: the id of each revealed word, HIDDEN otherwise
+        self.key_ids = [KEY_IDS[k] for k in self.key_grid]
+        self.revealed = [HIDDEN] * len(self.words_on_board)
+        # number of revealed words per key id
+        self._revealed_counts = [0] * len(REVEALED_MARKERS)
+
+        if self.do_print:
+            self._build_display_cells()
+
+        # parts of the logged results that don't change during the game
+        self._results_template = {"game_name": self.game_name,
+                                  "total_turns": None,
+                                  "R": None, "B": None, "C": None, "A": None,
+                                  "codemaster_red": self.codemaster_red.__class__.__name__,
+                                  "guesser_red": self.guesser_red.__class__.__name__,
+                                  "codemaster_blue": self.codemaster_blue.__class__.__name__,
+                                  "guesser_blue": self.guesser_blue.__class__.__name__,
+                                  "seed": self.seed,
+                                  "winner": None,
+                                  "time_s": None,
+                                  "cmr_kwargs": {k: v if isinstance(v, float) or isinstance(v, int) or isinstance(v, str) else None
+                                                 for k, v in self.cmr_kwargs.items()},
+                                  "gr_kwargs": {k: v if isinstance(v, float) or isinstance(v, int) or isinstance(v, str) else None
+                                                for k, v in self.gr_kwargs.items()},
+                                  "cmb_kwargs": {k: v if isinstance(v, float) or isinstance(v, int) or isinstance(v, str) else None
+                                                 for k, v in self.cmb_kwargs.items()},
+                                  "gb_kwargs": {k: v if isinstance(v, float) or isinstance(v, int) or isinstance(v, str) else None
+                                                for k, v in self.gb_kwargs.items()},
+                                  }
+
+    def _build_display_cells(self):
+        """Precompute the display strings for every cell, the board only changes by revealing words"""
+        colors = [KEY_COLORS[key_id] for key_id in self.key_ids]
+        # row breaks and cell spacing are baked into each cell
+        seps = ["\n\n" if i >= 1 and i % 5 == 0 else "" for i in range(len(self.words_on_board))]
+        board_seps = ["\n\n" if i % 5 == 0 else "" for i in range(len(self.words_on_board))]
+
+        # (hidden, revealed) strings for each cell of the codemaster board and the plain board
+        self._cm_cells = [(sep + str.center(color + word, 15) + "  ",
+                           sep + str.center(color + REVEALED_MARKERS[key_id], 15) + "  ")
+                          for sep, color, word, key_id in zip(seps, colors, self.words_on_board, self.key_ids)]
+        self._board_cells = [(sep + str.center(word, 10) + "  ",
+                              sep + str.center(REVEALED_MARKERS[key_id], 10) + "  ")
+                             for sep, word, key_id in zip(board_seps, self.words_on_board, self.key_ids)]
+
+        # the key grid never changes
+        self._key_grid_display = "".join(
+            ["\n\n", str.center(colorama.Fore.RESET +
+                                "____________________________KEY____________________________\n", 55), "\n"] +
+            [sep + str.center(color + key, 15) + "  " for sep, color, key in zip(seps, colors, self.key_grid)] +
+            [str.center(colorama.Fore.RESET +
+                        "\n___________________________________________________________", 55), "\n\n\n"])
 
     def _display_board_codemaster(self):
         """prints out board with color-paired words, only for codemaster, color && stylistic"""
-        print(str.center("___________________________BOARD___________________________\n", 60))
-        counter = 0
-        for i in range(len(self.words_on_board)):
-            if counter >= 1 and i % 5 == 0:
-                print("\n")
-            if self.key_grid[i] == 'Red':
-                print(str.center(colorama.Fore.RED + self.words_on_board[i], 15), " ", end='')
-                counter += 1
-            elif self.key_grid[i] == 'Blue':
-                print(str.center(colorama.Fore.BLUE + self.words_on_board[i], 15), " ", end='')
-                counter += 1
-            elif self.key_grid[i] == 'Civilian':
-                print(str.center(colorama.Fore.RESET + self.words_on_board[i], 15), " ", end='')
-                counter += 1
-            else:
-                print(str.center(colorama.Fore.MAGENTA + self.words_on_board[i], 15), " ", end='')
-                counter += 1
-        print(str.center(colorama.Fore.RESET +
-                         "\n___________________________________________________________", 60))
-        print("\n")
+        if not self.do_print:
+            return
+        parts = [str.center("___________________________BOARD___________________________\n", 60), "\n"]
+        parts.extend(cell[r != HIDDEN] for cell, r in zip(self._cm_cells, self.revealed))
+        parts.append(str.center(colorama.Fore.RESET +
+                                "\n___________________________________________________________", 60))
+        parts.append("\n\n\n")
+        sys.stdout.write("".join(parts))
 
     def _display_board(self):
         """prints the list of words in a board like fashion (5x5)"""
-        print(colorama.Style.RESET_ALL)
-        print(str.center("___________________________BOARD___________________________", 60))
-        for i in range(len(self.words_on_board)):
-            if i % 5 == 0:
-                print("\n")
-            print(str.center(self.words_on_board[i], 10), " ", end='')
+        if not self.do_print:
+            return
+        parts = [colorama.Style.RESET_ALL, "\n",
+                 str.center("___________________________BOARD___________________________", 60), "\n"]
+        parts.extend(cell[r != HIDDEN] for cell, r in zip(self._board_cells, self.revealed))
 
-        print(str.center("\n___________________________________________________________", 60))
-        print("\n")
+        parts.append(str.center("\n___________________________________________________________", 60))
+        parts.append("\n\n\n")
+        sys.stdout.write("".join(parts))
 
     def _display_key_grid(self):
         """ Print the key grid to stdout  """
-        print("\n")
-        print(str.center(colorama.Fore.RESET +
-                         "____________________________KEY____________________________\n", 55))
-        counter = 0
-        for i in range(len(self.key_grid)):
-            if counter >= 1 and i % 5 == 0:
-                print("\n")
-            if self.key_grid[i] == 'Red':
-                print(str.center(colorama.Fore.RED + self.key_grid[i], 15), " ", end='')
-                counter += 1
-            elif self.key_grid[i] == 'Blue':
-                print(str.center(colorama.Fore.BLUE + self.key_grid[i], 15), " ", end='')
-                counter += 1
-            elif self.key_grid[i] == 'Civilian':
-                print(str.center(colorama.Fore.RESET + self.key_grid[i], 15), " ", end='')
-                counter += 1
-            else:
-                print(str.center(colorama.Fore.MAGENTA + self.key_grid[i], 15), " ", end='')
-                counter += 1
-        print(str.center(colorama.Fore.RESET +
-                         "\n___________________________________________________________", 55))
-        print("\n")
+        if not self.do_print:
+            return
+        sys.stdout.write(self._key_grid_display)
 
     def get_words_on_board(self):
         """Return the list of words that represent the board state"""
@@ -194,27 +245,28 @@ class Game:
         """Function that takes in an int index called guess to compare with the key grid
         """
 
-        if self.key_grid[guess_index] == "Red":
-            self.words_on_board[guess_index] = "*Red*"
-            if self.words_on_board.count("*Red*") >= self.num_red_words:
+        key_id = self.key_ids[guess_index]
+        self.revealed[guess_index] = key_id
+        self.words_on_board[guess_index] = REVEALED_MARKERS[key_id]
+        self._revealed_counts[key_id] += 1
+
+        if key_id == RED:
+            if self._revealed_counts[RED] >= self.num_red_words:
                 return GameCondition.RED_WIN
             return GameCondition.RED_TURN
 
-        elif self.key_grid[guess_index] == "Blue":
-            self.words_on_board[guess_index] = "*Blue*"
-            if self.words_on_board.count("*Blue*") >= self.num_blue_words:
+        elif key_id == BLUE:
+            if self._revealed_counts[BLUE] >= self.num_blue_words:
                 return GameCondition.BLUE_WIN
             return GameCondition.BLUE_TURN
 
-        elif self.key_grid[guess_index] == "Assassin":
-            self.words_on_board[guess_index] = "*Assassin*"
+        elif key_id == ASSASSIN:
             if game_condition == GameCondition.RED_TURN:
                 return GameCondition.BLUE_WIN
             else:
                 return GameCondition.RED_WIN
 
         else:
-            self.words_on_board[guess_index] = "*Civilian*"
             if game_condition == GameCondition.RED_TURN:
                 return GameCondition.BLUE_TURN
             else:
@@ -224,60 +276,60 @@ class Game:
         """Logging function
         writes in both the original and a more detailed new style
         """
-        red_result = 0
-        blue_result = 0
-        civ_result = 0
-        assa_result = 0
-
-        for i in range(len(self.words_on_board)):
-            if self.words_on_board[i] == "*Red*":
-                red_result += 1
-            elif self.words_on_board[i] == "*Blue*":
-                blue_result += 1
-            elif self.words_on_board[i] == "*Civilian*":
-                civ_result += 1
-            elif self.words_on_board[i] == "*Assassin*":
-                assa_result += 1
-
-        if not os.path.exists("results"):
-            os.mkdir("results")
-
-        with open("results/bot_results.txt", "a") as f:
-            f.write(
-                f'TOTAL:{num_of_turns} B:{blue_result} C:{civ_result} A:{assa_result} '
-                f'R:{red_result} CODEMASTER_R:{self.codemaster_red.__class__.__name__} '
-                f'GUESSER_R:{self.guesser_red.__class__.__name__} '
-                f'CODEMASTER_B:{self.codemaster_blue.__class__.__name__} '
-                f'GUESSER_B:{self.guesser_blue.__class__.__name__} '
-                f'SEED:{self.seed} WINNER:{self.game_winner}\n'
-            )
-
-        with open("results/bot_results_new_style.txt", "a") as f:
-            results = {"game_name": self.game_name,
-                       "total_turns": num_of_turns,
-                       "R": red_result, "B": blue_result, "C": civ_result, "A": assa_result,
-                       "codemaster_red": self.codemaster_red.__class__.__name__,
-                       "guesser_red": self.guesser_red.__class__.__name__,
-                       "codemaster_blue": self.codemaster_blue.__class__.__name__,
-                       "guesser_blue": self.guesser_blue.__class__.__name__,
-                       "seed": self.seed,
-                       "winner": self.game_winner,
-                       "time_s": (self.game_end_time - self.game_start_time),
-                       "cmr_kwargs": {k: v if isinstance(v, float) or isinstance(v, int) or isinstance(v, str) else None
-                                      for k, v in self.cmr_kwargs.items()},
-                       "gr_kwargs": {k: v if isinstance(v, float) or isinstance(v, int) or isinstance(v, str) else None
-                                     for k, v in self.gr_kwargs.items()},
-                       "cmb_kwargs": {k: v if isinstance(v, float) or isinstance(v, int) or isinstance(v, str) else None
-                                      for k, v in self.cmb_kwargs.items()},
-                       "gb_kwargs": {k: v if isinstance(v, float) or isinstance(v, int) or isinstance(v, str) else None
-                                     for k, v in self.gb_kwargs.items()},
-                       }
-            f.write(json.dumps(results))
-            f.write('\n')
+        red_result = self._revealed_counts[RED]
+        blue_result = self._revealed_counts[BLUE]
+        civ_result = self._revealed_counts[CIVILIAN]
+        assa_result = self._revealed_counts[ASSASSIN]
+
+        Game._open_results()
+
+        Game._results_fh.write(
+            f'TOTAL:{num_of_turns} B:{blue_result} C:{civ_result} A:{assa_result} '
+            f'R:{red_result} CODEMASTER_R:{self.codemaster_red.__class__.__name__} '
+            f'GUESSER_R:{self.guesser_red.__class__.__name__} '
+            f'CODEMASTER_B:{self.codemaster_blue.__class__.__name__} '
+            f'GUESSER_B:{self.guesser_blue.__class__.__name__} '
+            f'SEED:{self.seed} WINNER:{self.game_winner}\n'
+        )
+
+        results = dict(self._results_template)
+        results["total_turns"] = num_of_turns
+        results["R"] = red_result
+        results["B"] = blue_result
+        results["C"] = civ_result
+        results["A"] = assa_result
+        results["winner"] = self.game_winner
+        results["time_s"] = self.game_end_time - self.game_start_time
+        if orjson is not None:
+            Game._results_json_fh.write(orjson.dumps(results).decode() + '\n')
+        else:
+            Game._results_json_fh.write(json.dumps(results, separators=(',', ':')) + '\n')
+
+        # flush so the results can be read back while the process is still running
+        Game._results_fh.flush()
+        Game._results_json_fh.flush()
+
+    @classmethod
+    def _open_results(cls):
+        """Open the results files for appending if they are not open already"""
+        if cls._results_fh is None:
+            os.makedirs("results", exist_ok=True)
+            cls._results_fh = open("results/bot_results.txt", "a")
+            cls._results_json_fh = open("results/bot_results_new_style.txt", "a")
+
+    @classmethod
+    def _close_results(cls):
+        """Close the results files if they are open"""
+        if cls._results_fh is not None:
+            cls._results_fh.close()
+            cls._results_json_fh.close()
+            cls._results_fh = None
+            cls._results_json_fh = None
 
     @staticmethod
     def clear_results():
         """Delete results folder"""
+        Game._close_results()
         if os.path.exists("results") and os.path.isdir("results"):
             shutil.rmtree("results")
 
@@ -286,9 +338,12 @@ class Game:
         game_condition = GameCondition.RED_TURN
         turn_counter = 0
 
-        # set the initial board/game state for all players
+        # these lists are updated in place during the game, so the references stay current
         words_in_play = self.get_words_on_board()
         current_key_grid = self.get_key_grid()
+        move_history = self.get_move_history()
+
+        # set the initial board/game state for all players
         self.codemaster_red.set_game_state(words_in_play, current_key_grid)
         self.guesser_red.set_board(words_in_play)
         if not self.single_team:
@@ -301,18 +356,15 @@ class Game:
                 current_team = "Red"
                 codemaster = self.codemaster_red
                 guesser = self.guesser_red
-                print("RED TEAM TURN")
+                self._print("RED TEAM TURN")
             else:
                 current_team = "Blue"
                 codemaster = self.codemaster_blue
                 guesser = self.guesser_blue
-                print("BLUE TEAM TURN")
+                self._print("BLUE TEAM TURN")
 
             # board setup and display
-            print('\n' * 2)
-            words_in_play = self.get_words_on_board()
-            current_key_grid = self.get_key_grid()
-            move_history = self.get_move_history()
+            self._print('\n' * 2)
             codemaster.set_move_history(move_history)
             codemaster.set_game_state(words_in_play, current_key_grid)
             self._display_key_grid()
@@ -320,17 +372,16 @@ class Game:
 
             # codemaster gives clue & number here
             clue, clue_num = codemaster.get_clue()
-            self.move_history.append([current_team+"_Codemaster", clue, clue_num])
+            move_history.append([current_team+"_Codemaster", clue, clue_num])
             turn_counter += 1
             keep_guessing = True
             clue_num = int(clue_num)
 
-            print('\n' * 2)
+            self._print('\n' * 2)
             guesser.set_clue(clue, clue_num)
 
             while keep_guessing:
 
-                move_history = self.get_move_history()
                 guesser.set_move_history(move_history)
                 guesser.set_board(words_in_play)
                 guess_answer = guesser.get_answer()
@@ -338,15 +389,20 @@ class Game:
                 # if no comparisons were made/found than retry input from codemaster
                 if guess_answer is None or guess_answer == "no comparisons":
                     break
-                guess_answer_index = words_in_play.index(guess_answer.upper().strip())
+                # board words are already upper case, so only normalize guesses that miss
+                guess_answer_index = self._word_to_index.get(guess_answer)
+                if guess_answer_index is None:
+                    guess_answer_index = self._word_to_index.get(guess_answer.upper().strip())
+                if guess_answer_index is None or self.revealed[guess_answer_index] != HIDDEN:
+                    raise ValueError(f"{guess_answer.upper().strip()} is not an unguessed word on the board")
                 game_condition_result = self._accept_guess(guess_answer_index, game_condition)
 
                 if game_condition == game_condition_result:
-                    print('\n' * 2)
+                    self._print('\n' * 2)
                     self._display_board_codemaster()
-                    print("Keep Guessing? the clue is ", clue, clue_num)
+                    self._print("Keep Guessing? the clue is ", clue, clue_num)
                     keep_guessing = guesser.keep_guessing()
-                    self.move_history.append([current_team+"_Guesser", guess_answer, self.words_on_board[guess_answer_index], keep_guessing])
+                    move_history.append([current_team+"_Guesser", guess_answer, words_in_play[guess_answer_index], keep_guessing])
 
                     if not keep_guessing:
                         if game_condition == GameCondition.RED_TURN:
@@ -356,7 +412,7 @@ class Game:
                 else:
                     keep_guessing = False
                     game_condition = game_condition_result
-                    self.move_history.append([current_team+"_Guesser", guess_answer, self.words_on_board[guess_answer_index], False])
+                    move_history.append([current_team+"_Guesser", guess_answer, words_in_play[guess_answer_index], False])
 
                 # If playing single team version, then it is always the red team's turn.
                 if self.single_team and game_condition == GameCondition.BLUE_TURN:
@@ -365,13 +421,16 @@ class Game:
 
         if game_condition == GameCondition.RED_WIN:
             self.game_winner = "R"
-            print("Red Team Wins!")
+            self._print("Red Team Wins!")
         else:
             self.game_winner = "B"
-            print("Blue Team Wins!")
+            self._print("Blue Team Wins!")
 
         self.game_end_time = time.time()
         self._display_board_codemaster()
         if self.do_log:
             self.write_results(turn_counter)
-        print("Game Over")
+        self._print("Game Over")
+
+
+atexit.register(Game._close_results)